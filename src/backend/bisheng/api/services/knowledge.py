@@ -446,7 +446,8 @@ class KnowledgeService(KnowledgeUtils):
             enable_formula=req_data.enable_formula,
             filter_page_header_footer=req_data.filter_page_header_footer,
             retain_images=req_data.retain_images,
-            excel_rule=excel_rule
+            excel_rule=excel_rule,
+            use_cache=True,
         )
         if len(texts) == 0:
             raise ValueError("文件解析为空")
@@ -1149,7 +1150,7 @@ class KnowledgeService(KnowledgeUtils):
     def judge_qa_knowledge_write(
             cls, login_user: UserPayload, qa_knowledge_id: int
     ) -> Knowledge:
-        db_knowledge = KnowledgeDao.query_by_id(qa_knowledge_id)
+        db_knowledge = KnowledgeDao.query_by_id_cached(qa_knowledge_id)
         # 查询当前知识库，是否有写入权限
         if not db_knowledge:
             raise ServerError.http_exception(msg="当前知识库不可用，返回上级目录")
@@ -1,12 +1,20 @@
+import hashlib
 import json
 import os
 import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
 from typing import Any, Dict, List, Optional, BinaryIO
 
+import orjson
 import requests
 from bisheng_langchain.rag.extract_info import extract_title
 from bisheng_langchain.text_splitter import ElemCharacterTextSplitter
+from cachetools import TTLCache, cached
+from cachetools.keys import hashkey
 from langchain.embeddings.base import Embeddings
 from langchain.schema.document import Document
 from langchain.text_splitter import CharacterTextSplitter
@@ -19,6 +27,7 @@ from langchain_community.document_loaders import (
     UnstructuredWordDocumentLoader,
 )
 from loguru import logger
+from openpyxl import Workbook
 from pymilvus import Collection
 from sqlalchemy import func, or_
 from sqlmodel import select
@@ -40,7 +49,7 @@ from bisheng.api.services.patch_130 import (
 from bisheng.api.utils import md5_hash
 from bisheng.api.v1.schemas import ExcelRule
 from bisheng.cache.redis import redis_client
-from bisheng.cache.utils import file_download
+from bisheng.cache.utils import file_download, save_uploaded_file
 from bisheng.database.base import session_getter
 from bisheng.database.models.knowledge import Knowledge, KnowledgeDao
 from bisheng.database.models.knowledge_file import (
@@ -340,6 +349,14 @@ def decide_vectorstores(
         param["collection_name"] = collection_name
         vector_config.pop("partition_suffix", "")
         vector_config.pop("is_partition", "")
+        # 仅对新建的collection生效，已有collection沿用原有索引
+        index_params = vector_config.pop("vector_index_params", None)
+        if index_params:
+            param["index_params"] = index_params
+        # 按索引类型配置的检索参数，每个collection仍按自身索引选用对应的参数
+        index_search_params = vector_config.pop("vector_search_params", None)
+        if index_search_params:
+            param["index_search_params"] = index_search_params
     else:
         raise RuntimeError("unknown vector store type")
 
@@ -643,23 +660,39 @@ def parse_document_title(title: str) -> str:
     return title
 
 
-def read_chunk_text(
+def _file_documents_cache_key(
         input_file,
         file_name,
-        separator: List[str],
-        separator_rule: List[str],
-        chunk_size: int,
-        chunk_overlap: int,
         knowledge_id: Optional[int] = None,
         retain_images: int = 1,
         enable_formula: int = 1,
         force_ocr: int = 1,
         filter_page_header_footer: int = 0,
         excel_rule: ExcelRule = None,
-) -> (List[str], List[dict], str, Any):  # type: ignore
+):
+    """ 按文件内容和解析参数生成缓存key，与切分参数无关 """
+    sha256_hash = hashlib.sha256()
+    with open(input_file, "rb") as f:
+        while chunk := f.read(1 << 20):
+            sha256_hash.update(chunk)
+    return hashkey(sha256_hash.hexdigest(), file_name, knowledge_id, retain_images, enable_formula, force_ocr,
+                   filter_page_header_footer, excel_rule.model_dump_json() if excel_rule else None)
+
+
+def load_file_documents(
+        input_file,
+        file_name,
+        knowledge_id: Optional[int] = None,
+        retain_images: int = 1,
+        enable_formula: int = 1,
+        force_ocr: int = 1,
+        filter_page_header_footer: int = 0,
+        excel_rule: ExcelRule = None,
+) -> (List[Document], List[Document], str, Any):  # type: ignore
     """
-    0：chunks text
-    1：chunks metadata
+    解析文件内容并生成文档总结标题，不做切分
+    0：documents 解析后的文档
+    1：texts excel文件已经切分好的内容，其他类型文件为空
     2：parse_type: etl4lm or un_etl4lm
     3: ocr bbox data: maybe None
     """
@@ -672,13 +705,6 @@ def read_chunk_text(
         raise Exception(
             f"文档知识库总结模型已失效，请前往模型管理-系统模型设置中进行配置。{str(e)}"
         )
-    text_splitter = ElemCharacterTextSplitter(
-        separators=separator,
-        separator_rule=separator_rule,
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        is_separator_regex=True,
-    )
     # 加载文档内容
     logger.info(f"start_file_loader file_name={file_name}")
     parse_type = ParseType.UN_ETL4LM.value
@@ -818,7 +844,83 @@ def read_chunk_text(
     if file_extension_name in ["xls", "xlsx", "csv"]:
         for one in texts:
             one.metadata["title"] = documents[0].metadata.get("title", "")
+    return documents, texts, parse_type, partitions
+
+
+# 预览时用户调整切分参数会反复解析同一个文件，解析结果与切分参数无关，短时间缓存起来只重新切分
+_load_file_documents_cached = cached(TTLCache(maxsize=32, ttl=600), key=_file_documents_cache_key,
+                                     lock=threading.Lock())(load_file_documents)
+
+
+def ensure_tmp_preview_file(input_file: str, file_name: str):
+    """ 确保doc、ppt文件的临时预览文件存在，不存在则重新转换并上传 """
+    file_extension_name = file_name.split(".")[-1].lower()
+    if file_extension_name not in ["doc", "ppt", "pptx"]:
+        return
+    object_name = KnowledgeUtils.get_tmp_preview_file_object_name(input_file)
+    if minio_client.object_exists(minio_client.tmp_bucket, object_name):
+        return
+    if file_extension_name == "doc":
+        preview_file = convert_doc_to_docx(input_doc_path=input_file)
     else:
+        preview_file = convert_ppt_to_pdf(input_path=input_file)
+    if preview_file:
+        upload_preview_file_to_minio(input_file, preview_file)
+
+
+def load_file_documents_cached(input_file, file_name, **kwargs):
+    """
+    带缓存的load_file_documents
+    缓存命中时不会执行解析过程中上传预览文件的逻辑，且缓存key与本地文件路径无关，需要单独检查预览文件
+    """
+    result = _load_file_documents_cached(input_file, file_name, **kwargs)
+    ensure_tmp_preview_file(input_file, file_name)
+    return result
+
+
+def read_chunk_text(
+        input_file,
+        file_name,
+        separator: List[str],
+        separator_rule: List[str],
+        chunk_size: int,
+        chunk_overlap: int,
+        knowledge_id: Optional[int] = None,
+        retain_images: int = 1,
+        enable_formula: int = 1,
+        force_ocr: int = 1,
+        filter_page_header_footer: int = 0,
+        excel_rule: ExcelRule = None,
+        use_cache: bool = False,
+) -> (List[str], List[dict], str, Any):  # type: ignore
+    """
+    0：chunks text
+    1：chunks metadata
+    2：parse_type: etl4lm or un_etl4lm
+    3: ocr bbox data: maybe None
+    use_cache: 是否复用同一文件的解析结果，用于预览时反复调整切分参数
+    """
+    load_func = load_file_documents_cached if use_cache else load_file_documents
+    documents, texts, parse_type, partitions = load_func(
+        input_file,
+        file_name,
+        knowledge_id=knowledge_id,
+        retain_images=retain_images,
+        enable_formula=enable_formula,
+        force_ocr=force_ocr,
+        filter_page_header_footer=filter_page_header_footer,
+        excel_rule=excel_rule,
+    )
+
+    file_extension_name = file_name.split(".")[-1].lower()
+    if file_extension_name not in ["xls", "xlsx", "csv"]:
+        text_splitter = ElemCharacterTextSplitter(
+            separators=separator,
+            separator_rule=separator_rule,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            is_separator_regex=True,
+        )
         logger.info(f"start_split_text file_name={file_name}")
         texts = text_splitter.split_documents(documents)
 
@@ -1028,6 +1130,20 @@ def add_qa(db_knowledge: Knowledge, data: QAKnowledgeUpsert) -> QAKnowledge:
         raise e
 
 
+def batch_add_qa(db_knowledge: Knowledge, qas: List[QAKnowledge]) -> List[QAKnowledge]:
+    """批量更新已有的QA，并删除旧的向量数据，新向量由celery任务异步写入"""
+    if db_knowledge.type != 1:
+        raise Exception("knowledge type error")
+    if not qas:
+        return []
+    for qa in qas:
+        qa.status = QAStatus.PROCESSING.value
+    qas = QAKnoweldgeDao.batch_update(qas)
+    # 需要先删除再插入
+    delete_vector_data(db_knowledge, [qa.id for qa in qas])
+    return qas
+
+
 def qa_status_change(qa_id: int, target_status: int):
     """QA 状态切换"""
     qa_db = QAKnoweldgeDao.get_qa_knowledge_by_primary_id(qa_id)
@@ -1103,6 +1219,81 @@ def list_qa_by_knowledge_id(
     return list_qa, count
 
 
+def list_qa_by_knowledge_id_keyset(
+        knowledge_id: int,
+        last_id: int = 0,
+        limit: int = 10,
+        question: Optional[str] = None,
+        answer: Optional[str] = None,
+        status: Optional[int] = None,
+) -> List[QAKnowledge]:
+    """按主键游标分页获取知识库下的qa，用于全量导出，避免深分页的offset扫描"""
+    if not knowledge_id:
+        return []
+
+    list_sql = select(QAKnowledge).where(QAKnowledge.knowledge_id == knowledge_id,
+                                         QAKnowledge.id > last_id)
+    if status:
+        list_sql = list_sql.where(QAKnowledge.status == status)
+    if question:
+        list_sql = list_sql.where(QAKnowledge.questions.like(f"%{question}%"))
+    if answer:
+        list_sql = list_sql.where(QAKnowledge.answers.like(f"%{answer}%"))
+
+    list_sql = list_sql.order_by(QAKnowledge.id.asc()).limit(limit)
+    return QAKnoweldgeDao.query_by_condition(list_sql)
+
+
+def export_qa_knowledge_files(
+        knowledge_id: int,
+        question: Optional[str] = None,
+        answer: Optional[str] = None,
+        status: Optional[int] = None,
+        max_lines: int = 10000,
+) -> List[str]:
+    """导出QA知识库为excel，每max_lines条一个文件，返回文件的下载地址列表"""
+    # 每个文件至少一条数据，避免max_lines<=0时预取判断成立而取空列表的最后一条
+    max_lines = max(max_lines, 1)
+    file_list = []
+    file_pr = datetime.now().strftime('%Y%m%d%H%M%S')
+    file_index = 1
+    query_kwargs = {'question': question, 'answer': answer, 'status': status}
+    # 单线程预取下一页数据，数据库查询与excel写入重叠执行，同时最多只多占用一页内存
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        qa_list = list_qa_by_knowledge_id_keyset(knowledge_id, 0, max_lines, **query_kwargs)
+        while True:
+            next_page = None
+            if len(qa_list) >= max_lines:
+                next_page = executor.submit(list_qa_by_knowledge_id_keyset, knowledge_id,
+                                            qa_list[-1].id, max_lines, **query_kwargs)
+
+            # 一次扫描得到最大相似问数量，表头固定后按定长元组逐行流式写入，不再构造DataFrame
+            if qa_list:
+                max_questions = max(len(qa.questions) for qa in qa_list)
+                all_title = ["问题", "答案"] + [f"相似问题{index}" for index in range(1, max_questions)]
+            else:
+                all_title = ["问题", "答案", "相似问题1", "相似问题2"]
+            workbook = Workbook(write_only=True)
+            worksheet = workbook.create_sheet("Sheet1")
+            worksheet.append(all_title)
+            for qa in qa_list:
+                padding = ('',) * (max_questions - len(qa.questions))
+                worksheet.append((qa.questions[0], orjson.loads(qa.answers)[0], *qa.questions[1:], *padding))
+            bio = BytesIO()
+            workbook.save(bio)
+            file_name = f"{file_pr}_{file_index}.xlsx"
+            file_index = file_index + 1
+            file_path = save_uploaded_file(bio, 'bisheng', file_name)
+            file_list.append(file_path)
+            if next_page is None:
+                break
+            qa_list = next_page.result()
+            # 总数恰好是max_lines的整数倍时，最后一页为空，不再生成只有表头的文件
+            if not qa_list:
+                break
+    return file_list
+
+
 def delete_vector_data(knowledge: Knowledge, file_ids: List[int]):
     """删除向量数据, 想做一个通用的，可以对接langchain的vectorDB"""
     # embeddings = FakeEmbedding()
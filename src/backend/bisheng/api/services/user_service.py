@@ -1,7 +1,7 @@
 import functools
 import json
 from base64 import b64decode
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
 import rsa
 from bisheng.api.errcode.base import UnAuthorizedError
@@ -74,6 +74,23 @@ class UserPayload:
             return True
         return False
 
+    def bulk_access_check(self, resources: List[Tuple[int, str]], access_type: AccessType) -> Dict[str, bool]:
+        """
+            批量检查用户是否有多个资源的权限，授权表只查询一次
+            resources: [(owner_user_id, target_id)]
+            返回 {target_id: 是否有权限}
+        """
+        if self.is_admin():
+            return {target_id: True for _, target_id in resources}
+        # 判断是否属于本人资源
+        result = {target_id: self.user_id == owner_user_id for owner_user_id, target_id in resources}
+        # 判断授权
+        need_check = [target_id for target_id, flag in result.items() if not flag]
+        if need_check:
+            for one in RoleAccessDao.find_role_access(self.user_role, need_check, access_type):
+                result[one.third_id] = True
+        return result
+
     @wrapper_access_check
     def copiable_check(self, owner_user_id: int) -> bool:
         """
@@ -1,14 +1,24 @@
+import asyncio
+import csv
+import io
 import json
+import sys
 import urllib.parse
 from datetime import datetime
 from io import BytesIO
 from typing import List, Optional, Any
 
+import orjson
 import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+from pymilvus import DataType
 from fastapi import (APIRouter, BackgroundTasks, Body, Depends, File, HTTPException, Query, Request,
                      UploadFile)
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import StreamingResponse
+from langchain.vectorstores.base import VectorStore
+from starlette.concurrency import run_in_threadpool
 
 from bisheng.api.errcode.base import UnAuthorizedError
 from bisheng.api.errcode.knowledge import KnowledgeCPError, KnowledgeQAError
@@ -18,6 +28,7 @@ from bisheng.api.services.knowledge_imp import add_qa
 from bisheng.api.services.user_service import UserPayload, get_login_user
 from bisheng.api.v1.schemas import (KnowledgeFileProcess, UpdatePreviewFileChunk, UploadFileResponse,
                                     resp_200, resp_500)
+from bisheng.cache.redis import redis_client
 from bisheng.cache.utils import save_uploaded_file
 from bisheng.database.models.knowledge import Knowledge, KnowledgeDao, SplitRule, KnowledgeTypeEnum, KnowledgeUpdate, \
     update_file_tags, get_all_tags
@@ -26,8 +37,10 @@ from bisheng.database.models.knowledge_file import (KnowledgeFileDao, KnowledgeF
 from bisheng.database.models.llm_server import LLMModel
 from bisheng.database.models.role_access import AccessType
 from bisheng.database.models.user import UserDao
+from bisheng.utils import generate_uuid
 from bisheng.utils.logger import logger
-from bisheng.worker.knowledge.qa import insert_qa_celery
+from bisheng.worker.knowledge.qa import (QA_CELERY_BATCH_SIZE, QA_EXPORT_TASK_EXPIRE, QA_EXPORT_TASK_KEY,
+                                           export_qa_celery, insert_qa_batch_celery, insert_qa_celery)
 
 # build router
 router = APIRouter(prefix='/knowledge', tags=['Knowledge'])
@@ -35,15 +48,41 @@ router = APIRouter(prefix='/knowledge', tags=['Knowledge'])
 # 配置API请求超时时间
 REQUEST_TIMEOUT = 60  # 增加到60秒，适应更复杂的查询
 MAX_TOKENS = 2048     # 保持最大token数合理
+# 导出CSV时每次从数据库读取并发送的行数
+EXPORT_PAGE_SIZE = 1000
+# 导入向量数据时每批写入milvus的行数
+VECTOR_IMPORT_BATCH_SIZE = 500
+# 导入向量数据时同时写入milvus的批次数
+VECTOR_IMPORT_CONCURRENCY = 4
+
+
+# JSON值可能的首字符，其他开头的单元格直接当作字符串，不必尝试解析
+_JSON_FIRST_CHARS = frozenset('{["-0123456789tfn')
+
+
+def _maybe_json(value: Any) -> Any:
+    """ 导入CSV时尝试把单元格解析为JSON，明显不是JSON的值原样返回 """
+    if not isinstance(value, str) or not value or value[0] not in _JSON_FIRST_CHARS:
+        return value
+    try:
+        return orjson.loads(value)
+    except orjson.JSONDecodeError:
+        return value
+
+
+class _CsvEcho:
+    """ csv.writer的输出对象，write直接返回格式化后的行，避免写入缓冲区再读取 """
+
+    def write(self, value: str) -> str:
+        return value
+
 
 # 在查询函数中添加超时处理
-def search_knowledge(query: str, timeout: int = REQUEST_TIMEOUT):
+async def search_knowledge(vector_store: VectorStore, query: str, timeout: int = REQUEST_TIMEOUT):
     try:
-        # 实现带超时的查询逻辑
-        with timeout_decorator(timeout):
-            results = vector_store.search(query)
-            return results
-    except TimeoutError:
+        # 同步检索放到线程池中执行，超时后由事件循环取消等待，不阻塞其他请求
+        return await asyncio.wait_for(run_in_threadpool(vector_store.search, query), timeout)
+    except asyncio.TimeoutError:
         logger.error("Search request timed out")
         raise HTTPException(status_code=504, detail="Search request timed out")
 
@@ -54,7 +93,8 @@ async def upload_file(*, file: UploadFile = File(...)):
         file_name = file.filename
         # 缓存本地
         uuid_file_name = KnowledgeService.save_upload_file_original_name(file_name)
-        file_path = save_uploaded_file(file.file, 'bisheng', uuid_file_name)
+        # 上传到minio是阻塞IO，放到线程池中执行，避免阻塞事件循环
+        file_path = await run_in_threadpool(save_uploaded_file, file.file, 'bisheng', uuid_file_name)
         if not isinstance(file_path, str):
             file_path = str(file_path)
         return resp_200(UploadFileResponse(file_path=file_path))
@@ -121,12 +161,12 @@ async def process_knowledge_file(*,
 
 
 @router.post('/create')
-def create_knowledge(*,
-                     request: Request,
-                     login_user: UserPayload = Depends(get_login_user),
-                     knowledge: KnowledgeCreate):
+async def create_knowledge(*,
+                           request: Request,
+                           login_user: UserPayload = Depends(get_login_user),
+                           knowledge: KnowledgeCreate):
     """ 创建知识库. """
-    db_knowledge = KnowledgeService.create_knowledge(request, login_user, knowledge)
+    db_knowledge = await run_in_threadpool(KnowledgeService.create_knowledge, request, login_user, knowledge)
     return resp_200(db_knowledge)
 
 
@@ -178,14 +218,15 @@ async def merge_knowledge(*,
     
     # 检查源知识库是否存在且用户有权限
     source_knowledges = KnowledgeDao.get_list_by_ids(source_ids)
-    for source_knowledge in source_knowledges:
-        if not source_knowledge:
-            raise HTTPException(status_code=404, detail=f"源知识库不存在: {source_id}")
-        
-        if not login_user.access_check(
-            source_knowledge.user_id, str(source_knowledge.id), AccessType.KNOWLEDGE
-        ):
-            raise UnAuthorizedError.http_exception()
+    missing_ids = set(source_ids) - {one.id for one in source_knowledges}
+    if missing_ids:
+        raise HTTPException(status_code=404, detail=f"源知识库不存在: {sorted(missing_ids)}")
+
+    access_result = login_user.bulk_access_check(
+        [(one.user_id, str(one.id)) for one in source_knowledges], AccessType.KNOWLEDGE
+    )
+    if not all(access_result.values()):
+        raise UnAuthorizedError.http_exception()
     
     try:
         # 执行合并操作
@@ -199,18 +240,18 @@ async def merge_knowledge(*,
 
 
 @router.get('', status_code=200)
-def get_knowledge(*,
-                  request: Request,
-                  login_user: UserPayload = Depends(get_login_user),
-                  name: str = None,
-                  knowledge_type: int = Query(default=KnowledgeTypeEnum.NORMAL.value,
-                                              alias='type'),
-                  page_size: Optional[int] = 10,
-                  page_num: Optional[int] = 1):
+async def get_knowledge(*,
+                        request: Request,
+                        login_user: UserPayload = Depends(get_login_user),
+                        name: str = None,
+                        knowledge_type: int = Query(default=KnowledgeTypeEnum.NORMAL.value,
+                                                    alias='type'),
+                        page_size: Optional[int] = 10,
+                        page_num: Optional[int] = 1):
     """ 读取所有知识库信息. """
     knowledge_type = KnowledgeTypeEnum(knowledge_type)
-    res, total = KnowledgeService.get_knowledge(request, login_user, knowledge_type, name,
-                                                page_num, page_size)
+    res, total = await run_in_threadpool(KnowledgeService.get_knowledge, request, login_user, knowledge_type,
+                                         name, page_num, page_size)
     return resp_200(data={'data': res, 'total': total})
 
 
@@ -245,19 +286,19 @@ def delete_knowledge(*,
 
 
 @router.get('/file_list/{knowledge_id}', status_code=200)
-def get_filelist(*,
-                 request: Request,
-                 login_user: UserPayload = Depends(get_login_user),
-                 file_name: str = None,
-                 file_ids: list[int] = None,
-                 knowledge_id: int = 0,
-                 page_size: int = 10,
-                 page_num: int = 1,
-                 status: Optional[int] = None):
+async def get_filelist(*,
+                       request: Request,
+                       login_user: UserPayload = Depends(get_login_user),
+                       file_name: str = None,
+                       file_ids: list[int] = None,
+                       knowledge_id: int = 0,
+                       page_size: int = 10,
+                       page_num: int = 1,
+                       status: Optional[int] = None):
     """ 获取知识库文件信息. """
-    data, total, flag = KnowledgeService.get_knowledge_files(request, login_user, knowledge_id,
-                                                             file_name, status, page_num,
-                                                             page_size, file_ids)
+    data, total, flag = await run_in_threadpool(KnowledgeService.get_knowledge_files, request, login_user,
+                                                knowledge_id, file_name, status, page_num,
+                                                page_size, file_ids)
 
     return resp_200({
         'data': data,
@@ -287,7 +328,7 @@ def get_QA_list(*,
     data = [jsonable_encoder(qa) for qa in qa_list]
     for qa in data:
         qa['questions'] = qa['questions'][0]
-        qa['answers'] = json.loads(qa['answers'])[0]
+        qa['answers'] = orjson.loads(qa['answers'])[0]
         qa['user_name'] = user_map.get(qa['user_id'], qa['user_id'])
 
     return resp_200({
@@ -302,23 +343,23 @@ def get_QA_list(*,
 
 
 @router.post('/retry', status_code=200)
-def retry(*,
-          request: Request,
-          login_user: UserPayload = Depends(get_login_user),
-          background_tasks: BackgroundTasks,
-          req_data: dict):
+async def retry(*,
+                request: Request,
+                login_user: UserPayload = Depends(get_login_user),
+                background_tasks: BackgroundTasks,
+                req_data: dict):
     """失败重试"""
-    KnowledgeService.retry_files(request, login_user, background_tasks, req_data)
+    await run_in_threadpool(KnowledgeService.retry_files, request, login_user, background_tasks, req_data)
     return resp_200()
 
 
 @router.delete('/file/{file_id}', status_code=200)
-def delete_knowledge_file(*,
-                          request: Request,
-                          file_id: int,
-                          login_user: UserPayload = Depends(get_login_user)):
+async def delete_knowledge_file(*,
+                                request: Request,
+                                file_id: int,
+                                login_user: UserPayload = Depends(get_login_user)):
     """ 删除知识文件信息 """
-    KnowledgeService.delete_knowledge_file(request, login_user, [file_id])
+    await run_in_threadpool(KnowledgeService.delete_knowledge_file, request, login_user, [file_id])
     return resp_200(message='删除成功')
 
 
@@ -386,7 +427,7 @@ async def qa_add(*, QACreate: QAKnowledgeUpsert,
                  login_user: UserPayload = Depends(get_login_user)):
     """ 增加知识库信息. """
     QACreate.user_id = login_user.user_id
-    db_knowledge = KnowledgeDao.query_by_id(QACreate.knowledge_id)
+    db_knowledge = KnowledgeDao.query_by_id_cached(QACreate.knowledge_id)
     if db_knowledge.type != KnowledgeTypeEnum.QA.value:
         raise HTTPException(status_code=404, detail='知识库类型错误')
 
@@ -400,12 +441,12 @@ async def qa_add(*, QACreate: QAKnowledgeUpsert,
 
 
 @router.post('/qa/status_switch', status_code=200)
-def qa_status_switch(*,
-                     status: int = Body(embed=True),
-                     id: int = Body(embed=True),
-                     login_user: UserPayload = Depends(get_login_user)):
+async def qa_status_switch(*,
+                           status: int = Body(embed=True),
+                           id: int = Body(embed=True),
+                           login_user: UserPayload = Depends(get_login_user)):
     """ 修改知识库信息. """
-    new_qa_db = knowledge_imp.qa_status_change(id, status)
+    new_qa_db = await run_in_threadpool(knowledge_imp.qa_status_change, id, status)
     if not new_qa_db:
         return resp_200()
     if new_qa_db.status != status:
@@ -418,7 +459,7 @@ def qa_status_switch(*,
 def qa_list(*, id: int, login_user: UserPayload = Depends(get_login_user)):
     """ 增加知识库信息. """
     qa_knowledge = QAKnoweldgeDao.get_qa_knowledge_by_primary_id(id)
-    qa_knowledge.answers = json.loads(qa_knowledge.answers)[0]
+    qa_knowledge.answers = orjson.loads(qa_knowledge.answers)[0]
     return resp_200(data=qa_knowledge)
 
 
@@ -431,13 +472,20 @@ def qa_append(
 ):
     """ 增加知识库信息. """
     QA_list = QAKnoweldgeDao.select_list(ids)
-    knowledge = KnowledgeDao.query_by_id(QA_list[0].knowledge_id)
-    for q in QA_list:
-        if question in q.questions:
-            raise KnowledgeQAError.http_exception()
+    if len({qa.knowledge_id for qa in QA_list}) != 1:
+        raise HTTPException(status_code=400, detail='QA不属于同一个知识库')
+    knowledge = KnowledgeDao.query_by_id_cached(QA_list[0].knowledge_id)
+    existing_questions = {one for qa in QA_list for one in qa.questions}
+    if question in existing_questions:
+        raise KnowledgeQAError.http_exception()
     for qa in QA_list:
-        qa.questions.append(question)
-        knowledge_imp.add_qa(knowledge, qa)
+        qa.questions = qa.questions + [question]
+    knowledge_imp.batch_add_qa(knowledge, QA_list)
+
+    # async task add qa into milvus and es
+    qa_ids = [qa.id for qa in QA_list]
+    for index in range(0, len(qa_ids), QA_CELERY_BATCH_SIZE):
+        insert_qa_batch_celery.delay(qa_ids[index:index + QA_CELERY_BATCH_SIZE])
     return resp_200()
 
 
@@ -447,7 +495,9 @@ def qa_delete(*,
               login_user: UserPayload = Depends(get_login_user)):
     """ 删除知识文件信息 """
     knowledge_dbs = QAKnoweldgeDao.select_list(ids)
-    knowledge = KnowledgeDao.query_by_id(knowledge_dbs[0].knowledge_id)
+    if len({qa.knowledge_id for qa in knowledge_dbs}) != 1:
+        raise HTTPException(status_code=400, detail='QA不属于同一个知识库')
+    knowledge = KnowledgeDao.query_by_id_cached(knowledge_dbs[0].knowledge_id)
     if not login_user.access_check(knowledge.user_id, str(knowledge.id),
                                    AccessType.KNOWLEDGE_WRITE):
         raise HTTPException(status_code=404, detail='没有权限执行操作')
@@ -491,7 +541,7 @@ def get_export_url(*,
                    answer: Optional[str] = None,
                    keyword: Optional[str] = None,
                    status: Optional[int] = None,
-                   max_lines: Optional[int] = 10000,
+                   max_lines: int = Query(default=10000, ge=1),
                    login_user: UserPayload = Depends(get_login_user)):
     # 查询当前知识库，是否有写入权限
     db_knowledge = KnowledgeService.judge_qa_knowledge_write(login_user, qa_knowledge_id)
@@ -499,73 +549,48 @@ def get_export_url(*,
     if keyword:
         question = keyword
 
-    def get_qa_source(source):
-        '0: 未知 1: 手动；2: 审计, 3: api'
-        if int(source) == 1:
-            return "手动创建"
-        elif int(source) == 2:
-            return "审计创建"
-        elif int(source) == 3:
-            return "api创建"
-        return "未知"
-
-    def get_status(statu):
-        if int(statu) == 1:
-            return "开启"
-        return "关闭"
-
-    page_num = 1
-    total_num = 0
-    page_size = max_lines
-    user_list = UserDao.get_all_users()
-    user_map = {user.user_id: user.user_name for user in user_list}
-    file_list = []
-    file_pr = datetime.now().strftime('%Y%m%d%H%M%S')
-    file_index = 1
-    while True:
-        qa_list, total_count = knowledge_imp.list_qa_by_knowledge_id(qa_knowledge_id, page_size,
-                                                                     page_num, question, answer,
-                                                                     status)
-
-        data = [jsonable_encoder(qa) for qa in qa_list]
-        qa_dict_list = []
-        all_title = ["问题", "答案"]
-        for qa in data:
-            qa_dict_list.append({
-                "问题": qa['questions'][0],
-                "答案": json.loads(qa['answers'])[0],
-                # "类型":get_qa_source(qa['source']),
-                # "创建时间":qa['create_time'],
-                # "更新时间":qa['update_time'],
-                # "创建者":user_map.get(qa['user_id'], qa['user_id']),
-                # "状态":get_status(qa['status']),
-            })
-            for index, question in enumerate(qa['questions']):
-                if index == 0:
-                    continue
-                key = f"相似问题{index}"
-                if key not in all_title:
-                    all_title.append(key)
-                qa_dict_list[-1][key] = question
-        if len(qa_dict_list) != 0:
-            df = pd.DataFrame(qa_dict_list)
-        else:
-            df = pd.DataFrame([{"问题": "", "答案": "", "相似问题1": "", "相似问题2": ""}])
-        df = df[all_title]
-        bio = BytesIO()
-        with pd.ExcelWriter(bio, engine="openpyxl") as writer:
-            df.to_excel(writer, sheet_name="Sheet1", index=False)
-        file_name = f"{file_pr}_{file_index}.xlsx"
-        file_index = file_index + 1
-        file_path = save_uploaded_file(bio, 'bisheng', file_name)
-        file_list.append(file_path)
-        total_num += len(qa_list)
-        if len(qa_list) < page_size or total_num >= total_count:
-            break
-
+    file_list = knowledge_imp.export_qa_knowledge_files(qa_knowledge_id, question, answer, status, max_lines)
     return resp_200({"file_list": file_list})
 
 
+@router.post('/qa/export/task/{qa_knowledge_id}', status_code=200)
+def create_export_task(*,
+                       qa_knowledge_id: int,
+                       question: Optional[str] = Body(default=None, embed=True),
+                       answer: Optional[str] = Body(default=None, embed=True),
+                       keyword: Optional[str] = Body(default=None, embed=True),
+                       status: Optional[int] = Body(default=None, embed=True),
+                       max_lines: int = Body(default=10000, ge=1, embed=True),
+                       login_user: UserPayload = Depends(get_login_user)):
+    """ 异步导出QA知识库，返回任务ID，通过 /qa/export/status/{job_id} 查询导出结果 """
+    KnowledgeService.judge_qa_knowledge_write(login_user, qa_knowledge_id)
+
+    if keyword:
+        question = keyword
+
+    job_id = generate_uuid()
+    redis_client.set(QA_EXPORT_TASK_KEY.format(job_id),
+                     {'user_id': login_user.user_id, 'knowledge_id': qa_knowledge_id,
+                      'status': 'processing', 'file_list': []},
+                     expiration=QA_EXPORT_TASK_EXPIRE)
+    export_qa_celery.delay(job_id, qa_knowledge_id, question, answer, status, max_lines,
+                           login_user.user_id)
+    return resp_200({"job_id": job_id})
+
+
+@router.get('/qa/export/status/{job_id}', status_code=200)
+def get_export_task(*, job_id: str, login_user: UserPayload = Depends(get_login_user)):
+    """ 查询QA导出任务的状态和导出的文件列表 """
+    task = redis_client.get(QA_EXPORT_TASK_KEY.format(job_id))
+    if not task:
+        raise HTTPException(status_code=404, detail='导出任务不存在或已过期')
+    # 只有任务创建者可以查询，且仍需要有该知识库的权限
+    if task.get('user_id') != login_user.user_id:
+        raise UnAuthorizedError.http_exception()
+    KnowledgeService.judge_qa_knowledge_write(login_user, task['knowledge_id'])
+    return resp_200(task)
+
+
 def convert_excel_value(value: Any):
     if value is None or value == "":
         return ''
@@ -585,7 +610,8 @@ def post_import_file(*,
     columns = df.columns.to_list()
     if '答案' not in columns or '问题' not in columns:
         raise HTTPException(status_code=500, detail='文件格式错误，没有 ‘问题’ 或 ‘答案’ 列')
-    data = df.T.to_dict().values()
+    similar_columns = [column for column in columns if str(column).startswith('相似问题')]
+    data = df.to_dict(orient='records')
     insert_data = []
     for dd in data:
         d = QAKnowledgeUpsert(
@@ -596,9 +622,9 @@ def post_import_file(*,
             source=4,
             create_time=datetime.now(),
             update_time=datetime.now())
-        for key, value in dd.items():
-            if key.startswith('相似问题') and convert_excel_value(value):
-                d.questions.append(convert_excel_value(value))
+        for column in similar_columns:
+            if value := convert_excel_value(dd[column]):
+                d.questions.append(value)
         insert_data.append(d)
     try:
         if size > 0 and offset >= 0:
@@ -629,11 +655,11 @@ def post_import_file(*,
         if '答案' not in columns or '问题' not in columns:
             insert_result.append(0)
             continue
-        data = df.T.to_dict().values()
-        insert_data = []
-        have_data = []
-        all_questions = set()
-        for index, dd in enumerate(data):
+        similar_columns = [column for column in columns if str(column).startswith('相似问题')]
+        data = df.to_dict(orient='records')
+        qa_rows = []
+        candidate_questions = set()
+        for dd in data:
             tmp_questions = set()
             dd_question = convert_excel_value(dd['问题'])
             dd_answer = convert_excel_value(dd['答案'])
@@ -645,15 +671,21 @@ def post_import_file(*,
                 source=4,
                 status=QAStatus.PROCESSING.value)
             tmp_questions.add(QACreate.questions[0])
-            for key, value in dd.items():
-                if key.startswith('相似问题'):
-                    if tmp_value := convert_excel_value(value):
-                        if tmp_value not in tmp_questions:
-                            QACreate.questions.append(tmp_value)
-                            tmp_questions.add(tmp_value)
-
-            db_q = QAKnoweldgeDao.get_qa_knowledge_by_name(QACreate.questions, QACreate.knowledge_id)
-            if (db_q and not QACreate.id) or len(tmp_questions & all_questions) > 0 or not dd_question or not dd_answer:
+            for column in similar_columns:
+                if tmp_value := convert_excel_value(dd[column]):
+                    if tmp_value not in tmp_questions:
+                        QACreate.questions.append(tmp_value)
+                        tmp_questions.add(tmp_value)
+            qa_rows.append((QACreate, tmp_questions, bool(dd_question and dd_answer)))
+            candidate_questions |= tmp_questions
+
+        # 一次查询出知识库内已存在的问题，避免逐行查库
+        existing_questions = QAKnoweldgeDao.get_existing_questions(qa_knowledge_id, candidate_questions)
+        insert_data = []
+        have_data = []
+        all_questions = set()
+        for index, (QACreate, tmp_questions, is_valid) in enumerate(qa_rows):
+            if tmp_questions & existing_questions or tmp_questions & all_questions or not is_valid:
                 have_data.append(index)
             else:
                 insert_data.append(QACreate)
@@ -674,7 +706,7 @@ async def export_knowledge_files(*,
                                  knowledge_id: int,
                                  login_user: UserPayload = Depends(get_login_user)):
     """导出知识库文件信息"""
-    db_knowledge = KnowledgeDao.query_by_id(knowledge_id)
+    db_knowledge = KnowledgeDao.query_by_id_cached(knowledge_id)
     if not db_knowledge:
         raise HTTPException(status_code=404, detail="知识库不存在")
     
@@ -683,24 +715,28 @@ async def export_knowledge_files(*,
     ):
         raise UnAuthorizedError.http_exception()
     
-    # 获取知识库下的所有文件
-    files = KnowledgeFileDao.get_file_by_filters(knowledge_id=knowledge_id)
-    
-    # 准备CSV数据
-    import csv
-    import io
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['文档名称', '文档摘要'])  # CSV header
-    for file in files:
-        writer.writerow([file.file_name, file.remark])  # 写入文件名和摘要信息
-    
-    output.seek(0)
-    
+    def iter_file_rows():
+        # 分页读取文件，每页写完即发送，不在内存中拼接完整的CSV
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(['文档名称', '文档摘要'])  # CSV header
+        page = 1
+        while True:
+            files = KnowledgeFileDao.get_file_by_filters(knowledge_id=knowledge_id, page=page,
+                                                         page_size=EXPORT_PAGE_SIZE)
+            for file in files:
+                writer.writerow([file.file_name, file.remark])  # 写入文件名和摘要信息
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+            if len(files) < EXPORT_PAGE_SIZE:
+                break
+            page += 1
+
     # 返回CSV文件
     headers = {"Content-Disposition": f"attachment; filename=knowledge_files_{knowledge_id}.csv"}
     return StreamingResponse(
-        iter([output.getvalue()]),
+        iter_file_rows(),
         media_type="text/csv",
         headers=headers
     )
@@ -711,7 +747,7 @@ async def export_knowledge_vectors(*,
                                    knowledge_id: int,
                                    login_user: UserPayload = Depends(get_login_user)):
     """导出知识库向量数据"""
-    db_knowledge = KnowledgeDao.query_by_id(knowledge_id)
+    db_knowledge = KnowledgeDao.query_by_id_cached(knowledge_id)
     if not db_knowledge:
         raise HTTPException(status_code=404, detail="知识库不存在")
     
@@ -736,43 +772,42 @@ async def export_knowledge_vectors(*,
             if s.name not in ['pk', 'vector', 'bbox']
         ]
         
-        # 查询所有向量数据
-        res_list = vector_client.col.query(
-            expr=f'knowledge_id=="{knowledge_id}"', 
-            output_fields=fields,
-            limit=10000  # 限制返回数量，防止数据过大
-        )
-        
-        # 准备CSV数据
-        import csv
-        import io
-        import json
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # 写入表头
-        if res_list:
-            headers = list(res_list[0].keys())
-            writer.writerow(headers)
-            
-            # 写入数据行
-            for item in res_list:
-                row = []
-                for header in headers:
-                    value = item.get(header, '')
-                    # 如果是字典或列表，转换为JSON字符串
-                    if isinstance(value, (dict, list)):
-                        row.append(json.dumps(value, ensure_ascii=False))
-                    else:
-                        row.append(value)
-                writer.writerow(row)
-        
-        output.seek(0)
-        
+        def iter_vector_rows():
+            # 通过迭代器分批拉取全部向量数据，边读边写，不受单次query的条数上限限制
+            iterator = vector_client.col.query_iterator(
+                batch_size=EXPORT_PAGE_SIZE,
+                expr=f'knowledge_id=="{knowledge_id}"',
+                output_fields=fields,
+            )
+            writer = csv.writer(_CsvEcho())
+            headers = None
+            try:
+                while res_list := iterator.next():
+                    lines = []
+                    # 写入表头
+                    if headers is None:
+                        headers = list(res_list[0].keys())
+                        lines.append(writer.writerow(headers))
+
+                    # 写入数据行
+                    for item in res_list:
+                        row = []
+                        for header in headers:
+                            value = item.get(header, '')
+                            # 如果是字典或列表，转换为JSON字符串
+                            if isinstance(value, (dict, list)):
+                                row.append(orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode())
+                            else:
+                                row.append(value)
+                        lines.append(writer.writerow(row))
+                    yield ''.join(lines)
+            finally:
+                iterator.close()
+
         # 返回CSV文件
         headers = {"Content-Disposition": f"attachment; filename=knowledge_vectors_{knowledge_id}.csv"}
         return StreamingResponse(
-            iter([output.getvalue()]),
+            iter_vector_rows(),
             media_type="text/csv",
             headers=headers
         )
@@ -796,57 +831,111 @@ async def import_knowledge_vectors(*,
         raise UnAuthorizedError.http_exception()
     
     try:
-        # 读取上传的CSV文件
-        content = await file.read()
-        csv_file = io.StringIO(content.decode('utf-8'))
-        reader = csv.DictReader(csv_file)
-        vector_data = [dict(row) for row in reader]
-        
-        if not vector_data:
-            raise HTTPException(status_code=400, detail="CSV文件为空")
-        
         # 获取向量库连接
         from bisheng.interface.embeddings.custom import FakeEmbedding
         from bisheng.api.services.knowledge_imp import decide_vectorstores
-        
+
         embeddings = FakeEmbedding()
         vector_client = decide_vectorstores(db_knowledge.collection_name, "Milvus", embeddings)
-        
+
         if not vector_client or not vector_client.col:
             raise HTTPException(status_code=400, detail="向量数据库连接失败")
-        
-        # 准备插入数据
-        import json
-        insert_data = []
-        for item in vector_data:
-            processed_item = {}
-            for key, value in item.items():
-                # 尝试解析JSON字符串
-                try:
-                    processed_item[key] = json.loads(value)
-                except (json.JSONDecodeError, TypeError):
-                    processed_item[key] = value
-            
-            # 确保knowledge_id正确
-            processed_item['knowledge_id'] = str(knowledge_id)
-            insert_data.append(processed_item)
-        
-        # 插入数据到向量库
-        if insert_data:
-            # 获取字段信息
-            field_names = [field.name for field in vector_client.col.schema.fields]
-            
-            # 过滤数据，只保留存在的字段
-            filtered_data = []
-            for item in insert_data:
-                filtered_item = {k: v for k, v in item.items() if k in field_names}
-                filtered_data.append(filtered_item)
-            
-            # 插入数据
-            vector_client.col.insert(filtered_data)
-            vector_client.col.flush()
-        
-        return resp_200(data={"message": "导入成功", "count": len(vector_data)})
+
+        # 只保留collection中存在的字段
+        field_set = frozenset(field.name for field in vector_client.col.schema.fields)
+
+        # 直接从上传的临时文件用pyarrow按块解析，按批次写入向量库，不把整个文件读入内存
+        def open_reader():
+            header_line = file.file.readline().decode('utf-8-sig').rstrip('\r\n')
+            file.file.seek(0)
+            column_names = next(csv.reader([header_line]), [])
+            # 所有列按字符串读取，类型转换统一交给_maybe_json
+            return pa_csv.open_csv(
+                pa.PythonFile(file.file, mode='r'),
+                read_options=pa_csv.ReadOptions(block_size=4 * 1024 * 1024),
+                # 导出的分块文本中包含换行，需要允许引号内的值跨行
+                parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types={name: pa.string() for name in column_names},
+                    strings_can_be_null=False,
+                ),
+            )
+
+        # 读文件和解析都是阻塞操作，放到线程池中执行，不占用事件循环
+        reader = await run_in_threadpool(open_reader)
+        # 只转换collection中存在的列，列名intern后所有行共用同一批key对象
+        keep_names = [sys.intern(name) for name in reader.schema.names if name in field_set]
+        # 字符串字段原样写入，只有JSON、数值、向量等字段需要尝试解析
+        varchar_fields = frozenset(field.name for field in vector_client.col.schema.fields
+                                   if field.dtype == DataType.VARCHAR)
+        parse_flags = [name not in varchar_fields for name in keep_names]
+        # 确保knowledge_id正确，所有行共用同一个字符串
+        knowledge_id_value = str(knowledge_id) if 'knowledge_id' in field_set else None
+
+        def read_next_rows() -> Optional[List[dict]]:
+            """ 读取下一块数据并转换为待插入的行，读完返回None """
+            try:
+                record_batch = reader.read_next_batch()
+            except StopIteration:
+                return None
+            # 按列整体转换，每行直接按列位置组装dict
+            columns = []
+            for name, need_parse in zip(keep_names, parse_flags):
+                column = record_batch.column(name).to_pylist()
+                columns.append([_maybe_json(v) for v in column] if need_parse else column)
+            rows = []
+            for values in zip(*columns):
+                processed_item = dict(zip(keep_names, values))
+                if knowledge_id_value is not None:
+                    processed_item['knowledge_id'] = knowledge_id_value
+                rows.append(processed_item)
+            return rows
+
+        # insert是阻塞的RPC，放到线程池中并发执行，最多同时有VECTOR_IMPORT_CONCURRENCY个批次在写入
+        insert_semaphore = asyncio.Semaphore(VECTOR_IMPORT_CONCURRENCY)
+        insert_tasks = []
+
+        async def insert_batch(rows: List[dict]):
+            try:
+                await run_in_threadpool(vector_client.col.insert, rows)
+            finally:
+                insert_semaphore.release()
+
+        async def submit_batch(rows: List[dict]):
+            await insert_semaphore.acquire()
+            # 已有批次写入失败时不再继续提交
+            for task in insert_tasks:
+                if task.done() and task.exception() is not None:
+                    insert_semaphore.release()
+                    raise task.exception()
+            insert_tasks.append(asyncio.create_task(insert_batch(rows)))
+
+        count = 0
+        try:
+            batch = []
+            while (rows := await run_in_threadpool(read_next_rows)) is not None:
+                for row in rows:
+                    batch.append(row)
+                    if len(batch) >= VECTOR_IMPORT_BATCH_SIZE:
+                        await submit_batch(batch)
+                        count += len(batch)
+                        batch = []
+            if batch:
+                await submit_batch(batch)
+                count += len(batch)
+            await asyncio.gather(*insert_tasks)
+        finally:
+            # 出错时取消还未完成的写入，并取回所有任务的结果，避免任务在后台继续运行
+            for task in insert_tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*insert_tasks, return_exceptions=True)
+
+        if not count:
+            raise HTTPException(status_code=400, detail="CSV文件为空")
+        vector_client.col.flush()
+
+        return resp_200(data={"message": "导入成功", "count": count})
         
     except Exception as e:
         logger.exception("导入向量数据失败")
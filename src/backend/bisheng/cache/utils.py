@@ -180,7 +180,7 @@ def upload_file_to_minio(file: UploadFile, object_name, bucket_name: str = tmp_b
 @create_cache_folder
 def save_uploaded_file(file, folder_name, file_name, bucket_name: str = tmp_bucket):
     """
-    Save an uploaded file to the specified folder with a hash of its content as the file name.
+    Save an uploaded file to the tmp bucket of minio, streaming it from the file object.
 
     Args:
         file: The uploaded file object.
@@ -197,18 +197,6 @@ def save_uploaded_file(file, folder_name, file_name, bucket_name: str = tmp_buck
     if not folder_path.exists():
         folder_path.mkdir()
 
-    # Create a hash of the file content
-    sha256_hash = hashlib.sha256()
-    # Reset the file cursor to the beginning of the file
-    file.seek(0)
-    # Iterate over the uploaded file in small chunks to conserve memory
-    while chunk := file.read(8192):  # Read 8KB at a time (adjust as needed)
-        sha256_hash.update(chunk)
-
-    # Use the hex digest of the hash as the file name
-    hex_dig = sha256_hash.hexdigest()
-    md5_name = hex_dig
-
     # Reset the file cursor to the beginning of the file
     file.seek(0)
 
@@ -219,9 +207,11 @@ def save_uploaded_file(file, folder_name, file_name, bucket_name: str = tmp_buck
         output_file = BytesIO()
         output_file = convert_encoding_cchardet(file, output_file)
 
-    # 存储到minio
-    file_byte = output_file.read()
-    minio_client.upload_tmp(file_name, file_byte)
+    # 存储到minio，按文件流分片上传，不把整个文件读入内存
+    output_file.seek(0, os.SEEK_END)
+    file_length = output_file.tell()
+    output_file.seek(0)
+    minio_client.upload_minio_file(file_name, output_file, tmp_bucket, file_length)
     file_path = minio_client.get_share_link(file_name, bucket_name)
     output_file.close()
     return file_path
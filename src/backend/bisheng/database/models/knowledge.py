@@ -1,7 +1,9 @@
+import threading
 from datetime import datetime
 from enum import Enum
 from typing import Any, List, Optional, Union
 
+from cachetools import TTLCache
 from pydantic import BaseModel, field_validator
 from sqlmodel import Column, DateTime, Field, delete, func, or_, select, text, update
 from sqlmodel.sql.expression import Select, SelectOfScalar
@@ -69,6 +71,11 @@ class KnowledgeCreate(KnowledgeBase):
     is_partition: Optional[bool] = None
 
 
+# 知识库元数据的进程内短时缓存，只给只读的热点接口使用
+_knowledge_cache: TTLCache = TTLCache(maxsize=1024, ttl=5)
+_knowledge_cache_lock = threading.Lock()
+
+
 class KnowledgeDao(KnowledgeBase):
 
     @classmethod
@@ -85,7 +92,8 @@ class KnowledgeDao(KnowledgeBase):
             session.add(data)
             session.commit()
             session.refresh(data)
-            return data
+        cls.clear_cache(data.id)
+        return data
 
     @classmethod
     def update_knowledge_update_time(cls, knowledge: Knowledge):
@@ -94,12 +102,31 @@ class KnowledgeDao(KnowledgeBase):
         with session_getter() as session:
             session.exec(statement)
             session.commit()
+        cls.clear_cache(knowledge.id)
 
     @classmethod
     def query_by_id(cls, knowledge_id: int) -> Knowledge:
         with session_getter() as session:
             return session.get(Knowledge, knowledge_id)
 
+    @classmethod
+    def query_by_id_cached(cls, knowledge_id: int) -> Knowledge:
+        """ 带短时缓存的查询，返回的对象在请求间共享，调用方不能修改后再写回数据库 """
+        with _knowledge_cache_lock:
+            knowledge = _knowledge_cache.get(knowledge_id)
+        if knowledge is not None:
+            return knowledge
+        knowledge = cls.query_by_id(knowledge_id)
+        if knowledge:
+            with _knowledge_cache_lock:
+                _knowledge_cache[knowledge_id] = knowledge
+        return knowledge
+
+    @classmethod
+    def clear_cache(cls, knowledge_id: int):
+        with _knowledge_cache_lock:
+            _knowledge_cache.pop(knowledge_id, None)
+
     @classmethod
     def get_list_by_ids(cls, ids: List[int]) -> List[Knowledge]:
         with session_getter() as session:
@@ -300,6 +327,8 @@ class KnowledgeDao(KnowledgeBase):
             for knowledge in knowledge_list:
                 session.add(knowledge)
             session.commit()
+        for knowledge in knowledge_list:
+            cls.clear_cache(knowledge.id)
 
     @classmethod
     def get_knowledge_by_name(cls, name: str, user_id: int = 0) -> Knowledge:
@@ -322,6 +351,7 @@ class KnowledgeDao(KnowledgeBase):
             if not only_clear:
                 session.exec(delete(Knowledge).where(Knowledge.id == knowledge_id))
             session.commit()
+        cls.clear_cache(knowledge_id)
 
     @classmethod
     def merge_knowledge(cls, source_ids: List[int], target_id: int, target_name: str = None, 
@@ -407,6 +437,7 @@ class KnowledgeDao(KnowledgeBase):
                     merged_count += 1
             
             session.commit()
+            cls.clear_cache(target_id)
             if merged_count > 0:
                 cls.update_knowledge_update_time(target)
             return merged_count
@@ -1,7 +1,7 @@
 import json
 from datetime import datetime
 from enum import Enum
-from typing import List, Optional
+from typing import List, Optional, Set
 
 # if TYPE_CHECKING:
 from pydantic import field_validator
@@ -211,7 +211,7 @@ class KnowledgeFileDao(KnowledgeFileBase):
             statement = statement.where(KnowledgeFile.id.in_(file_ids))
         if page and page_size:
             statement = statement.offset((page - 1) * page_size).limit(page_size)
-        statement = statement.order_by(KnowledgeFile.update_time.desc())
+        statement = statement.order_by(KnowledgeFile.update_time.desc(), KnowledgeFile.id.desc())
         with session_getter() as session:
             return session.exec(statement).all()
 
@@ -273,6 +273,21 @@ class QAKnoweldgeDao(QAKnowledgeBase):
                 statement = statement.where(QAKnowledge.id != exclude_id)
             return session.exec(statement).first()
 
+    @classmethod
+    def get_existing_questions(cls, knowledge_id: int, questions: Set[str]) -> Set[str]:
+        """ 一次查询返回questions中已存在于知识库内的问题 """
+        if not questions:
+            return set()
+        group_filters = [func.json_contains(QAKnowledge.questions, json.dumps(one)) for one in questions]
+        statement = select(QAKnowledge.questions).where(
+            QAKnowledge.knowledge_id == knowledge_id).where(or_(*group_filters))
+        with session_getter() as session:
+            db_questions = session.exec(statement).all()
+        existing = set()
+        for one in db_questions:
+            existing.update(one)
+        return existing & questions
+
     @classmethod
     def update(cls, qa_knowledge: QAKnowledge):
         if qa_knowledge.id is None:
@@ -283,6 +298,15 @@ class QAKnoweldgeDao(QAKnowledgeBase):
             session.refresh(qa_knowledge)
         return qa_knowledge
 
+    @classmethod
+    def batch_update(cls, qa_knowledges: List[QAKnowledge]) -> List[QAKnowledge]:
+        with session_getter() as session:
+            session.add_all(qa_knowledges)
+            session.commit()
+            for qa in qa_knowledges:
+                session.refresh(qa)
+        return qa_knowledges
+
     @classmethod
     def delete_batch(cls, qa_ids: List[int]) -> bool:
         with session_getter() as session:
@@ -8,6 +8,10 @@ from sqlmodel import Session, SQLModel, create_engine
 if TYPE_CHECKING:
     from sqlalchemy.engine import Engine
 
+# 数据库连接池大小，接口线程池的大小与之保持一致
+DB_POOL_SIZE = 100
+DB_MAX_OVERFLOW = 20
+
 
 class DatabaseService(Service):
     name: str = 'database_service'
@@ -27,7 +31,7 @@ class DatabaseService(Service):
             connect_args = {'check_same_thread': False}
         else:
             connect_args = {}
-        return create_engine(self.database_url, connect_args=connect_args, pool_size=100, max_overflow=20, pool_timeout=3, pool_pre_ping=True)
+        return create_engine(self.database_url, connect_args=connect_args, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=3, pool_pre_ping=True)
 
     def __enter__(self):
         self._session = Session(self.engine)
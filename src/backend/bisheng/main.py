@@ -2,8 +2,10 @@ from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Optional
 
+from anyio import to_thread
 from bisheng.api import router, router_rpc
 from bisheng.database.init_data import init_default_data
+from bisheng.database.service import DB_POOL_SIZE
 from bisheng.interface.utils import setup_llm_caching
 from bisheng.services.utils import initialize_services, teardown_services
 from bisheng.settings import settings
@@ -47,6 +49,8 @@ _EXCEPTION_HANDLERS = {
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # 同步接口和run_in_threadpool共用anyio默认线程池(默认40)，按数据库连接池大小放开并发上限
+    to_thread.current_default_thread_limiter().total_tokens = DB_POOL_SIZE
     initialize_services()
     setup_llm_caching()
     init_default_data()
@@ -1,17 +1,31 @@
 from bisheng_langchain.chat_models import ChatQWen
 from langchain_community.chat_models import ChatOpenAI
 from typing import List
+import asyncio
+import functools
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
-# 添加生成标签功能
-def generate_tags(content: str, model_name: str = "qwen-plus", max_tags: int = 5) -> List[str]:
-    """使用大模型生成文档标签"""
-    prompt = f"""
+# 批量生成标签时同时请求大模型的最大数量
+TAG_CONCURRENCY = 8
+
+
+@functools.lru_cache(maxsize=8)
+def _get_llm(model_name: str, temperature: float, max_tokens: int):
+    """按模型参数缓存大模型客户端，避免每次生成标签都重新初始化"""
+    if model_name.startswith("qwen"):
+        return ChatQWen(model=model_name, temperature=temperature, max_tokens=max_tokens)
+    # 默认使用OpenAI模型
+    return ChatOpenAI(model_name=model_name, temperature=temperature, max_tokens=max_tokens)
+
+
+# 生成标签的提示词模板，只填充标签数量和文档内容
+TAG_PROMPT_TEMPLATE = """
 根据以下文档内容生成{max_tags}个最相关的标签，用逗号分隔：
 
-{content[:2000]}  # 限制输入长度
+{content}
 
 要求：
 1. 返回最相关的{max_tags}个标签
@@ -19,24 +33,57 @@ def generate_tags(content: str, model_name: str = "qwen-plus", max_tags: int = 5
 3. 用中文标签
 4. 用逗号分隔
 """
-    
+# 提示词中文档内容的最大长度
+TAG_CONTENT_MAX_LENGTH = 2000
+# 模型返回的标签分隔符
+_TAG_SPLIT = re.compile(r'\s*[,，、]\s*')
+
+
+def _build_tag_prompt(content: str, max_tags: int) -> str:
+    return TAG_PROMPT_TEMPLATE.format(max_tags=max_tags, content=content[:TAG_CONTENT_MAX_LENGTH])
+
+
+def _parse_tags(response, max_tags: int) -> List[str]:
+    tags_text = response.content if hasattr(response, 'content') else str(response)
+    # 一次切分并去掉分隔符两侧的空白，兼容中文逗号和顿号
+    tags = [tag for tag in _TAG_SPLIT.split(tags_text.strip()) if tag]
+    return tags[:max_tags]
+
+
+# 添加生成标签功能
+def generate_tags(content: str, model_name: str = "qwen-plus", max_tags: int = 5) -> List[str]:
+    """使用大模型生成文档标签"""
     try:
         # 根据模型名称选择合适的模型
-        if model_name.startswith("qwen"):
-            llm = ChatQWen(model=model_name, temperature=0.3, max_tokens=100)
-        else:
-            # 默认使用OpenAI模型
-            llm = ChatOpenAI(model_name=model_name, temperature=0.3, max_tokens=100)
-        
+        llm = _get_llm(model_name, 0.3, 100)
+
         # 调用模型生成标签
-        response = llm.invoke(prompt)
-        
+        response = llm.invoke(_build_tag_prompt(content, max_tags))
+
         # 解析响应
-        tags_text = response.content if hasattr(response, 'content') else str(response)
-        tags = tags_text.strip().split(',')
-        # 清理标签
-        tags = [tag.strip() for tag in tags if tag.strip()]
-        return tags[:max_tags]
+        return _parse_tags(response, max_tags)
     except Exception as e:
         logger.error(f"Failed to generate tags: {str(e)}")
         return []
+
+
+async def generate_tags_many(contents: List[str], model_name: str = "qwen-plus",
+                             max_tags: int = 5) -> List[List[str]]:
+    """并发为多个文档生成标签，返回结果与contents一一对应，失败的文档返回空列表"""
+    try:
+        llm = _get_llm(model_name, 0.3, 100)
+    except Exception as e:
+        logger.error(f"Failed to generate tags: {str(e)}")
+        return [[] for _ in contents]
+    semaphore = asyncio.Semaphore(TAG_CONCURRENCY)
+
+    async def generate_one(content: str) -> List[str]:
+        try:
+            async with semaphore:
+                response = await llm.ainvoke(_build_tag_prompt(content, max_tags))
+            return _parse_tags(response, max_tags)
+        except Exception as e:
+            logger.error(f"Failed to generate tags: {str(e)}")
+            return []
+
+    return await asyncio.gather(*[generate_one(content) for content in contents])
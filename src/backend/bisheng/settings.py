@@ -53,8 +53,15 @@ class MilvusConf(BaseModel):
     connection_args: Optional[dict] = Field(default=None, description='milvus 配置')
     is_partition: Optional[bool] = Field(default=True, description='是否是partition模式')
     partition_suffix: Optional[str] = Field(default='1', description='partition后缀')
-
-    @field_validator('connection_args', mode='before')
+    vector_index_params: Optional[dict] = Field(default=None,
+                                                description='新建collection时向量字段的索引参数，'
+                                                            '为空时使用HNSW；如IVF_SQ8可做int8标量量化')
+    vector_search_params: Optional[dict] = Field(default=None,
+                                                 description='按索引类型配置的向量检索参数，'
+                                                             '如{"HNSW": {"params": {"ef": 64}}}，'
+                                                             '未配置的索引类型使用默认值')
+
+    @field_validator('connection_args', 'vector_index_params', 'vector_search_params', mode='before')
     @classmethod
     def convert_connection_args(cls, value):
         if isinstance(value, str):
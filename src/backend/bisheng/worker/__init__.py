@@ -1,3 +1,4 @@
 # register tasks
 from bisheng.worker.test.test import *
 from bisheng.worker.knowledge.file_worker import *
+from bisheng.worker.knowledge.qa import *
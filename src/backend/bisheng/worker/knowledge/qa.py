@@ -1,12 +1,22 @@
+from typing import List
+
 from loguru import logger
 
-from bisheng.api.services.knowledge_imp import QA_save_knowledge
+from bisheng.api.services.knowledge_imp import QA_save_knowledge, export_qa_knowledge_files
+from bisheng.cache.redis import redis_client
 from bisheng.database.models.knowledge import KnowledgeDao
 from bisheng.database.models.knowledge_file import (
     QAKnoweldgeDao,
 )
 from bisheng.worker import bisheng_celery
 
+# 批量写入向量库时，每个celery任务处理的QA数量
+QA_CELERY_BATCH_SIZE = 100
+
+# 导出任务的状态缓存key和过期时间
+QA_EXPORT_TASK_KEY = 'qa_export_task:{}'
+QA_EXPORT_TASK_EXPIRE = 86400
+
 
 @bisheng_celery.task
 def insert_qa_celery(qa_id: int):
@@ -23,3 +33,39 @@ def insert_qa_celery(qa_id: int):
             logger.error(f"Knowledge with id {qa_info.knowledge_id} not found.")
             return
         QA_save_knowledge(knowledge_info, qa_info)
+
+
+@bisheng_celery.task
+def insert_qa_batch_celery(qa_ids: List[int]):
+    """
+    Insert a batch of QA pairs of the same knowledge into the milvus and es.
+    """
+    with logger.contextualize(trace_id=f"insert_qa_batch_{qa_ids[0]}"):
+        qa_list = QAKnoweldgeDao.select_list(qa_ids)
+        knowledge_info = KnowledgeDao.query_by_id(qa_list[0].knowledge_id)
+        if not knowledge_info:
+            logger.error(f"Knowledge with id {qa_list[0].knowledge_id} not found.")
+            return
+        for qa_info in qa_list:
+            QA_save_knowledge(knowledge_info, qa_info)
+
+
+@bisheng_celery.task
+def export_qa_celery(job_id: str, knowledge_id: int, question: str = None, answer: str = None,
+                     status: int = None, max_lines: int = 10000, user_id: int = None):
+    """
+    Export the QA knowledge into excel files and cache the file list by job id.
+    """
+    # 保留任务归属信息，查询状态时用于鉴权
+    task_owner = {'user_id': user_id, 'knowledge_id': knowledge_id}
+    with logger.contextualize(trace_id=f"export_qa_{job_id}"):
+        try:
+            file_list = export_qa_knowledge_files(knowledge_id, question, answer, status, max_lines)
+            redis_client.set(QA_EXPORT_TASK_KEY.format(job_id),
+                             {**task_owner, 'status': 'success', 'file_list': file_list},
+                             expiration=QA_EXPORT_TASK_EXPIRE)
+        except Exception as e:
+            logger.exception(f"export qa knowledge {knowledge_id} failed")
+            redis_client.set(QA_EXPORT_TASK_KEY.format(job_id),
+                             {**task_owner, 'status': 'failed', 'file_list': [], 'message': str(e)},
+                             expiration=QA_EXPORT_TASK_EXPIRE)
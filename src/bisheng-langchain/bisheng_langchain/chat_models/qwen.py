@@ -1,13 +1,16 @@
 """proxy llm chat wrapper."""
 from __future__ import annotations
 
-import copy
+import functools
 import json
 import logging
 import sys
-from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+from collections import Counter
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
 
 import dashscope
+import orjson
+import requests
 from dashscope import Generation
 from pydantic import Field, validator
 
@@ -62,33 +65,83 @@ def _create_retry_decorator(llm: ChatQWen) -> Callable[[Any], Any]:
     )
 
 
-def _convert_message_to_dict(message: BaseMessage) -> dict:
-    if isinstance(message, ChatMessage):
-        message_dict = {'role': message.role, 'content': message.content}
-    elif isinstance(message, HumanMessage):
-        message_dict = {'role': 'user', 'content': message.content}
-    elif isinstance(message, AIMessage):
-        message_dict = {'role': 'assistant', 'content': message.content}
-        if 'function_call' in message.additional_kwargs:
-            message_dict['function_call'] = message.additional_kwargs['function_call']
-        if "tool_calls" in message.additional_kwargs:
-            message_dict["tool_calls"] = message.additional_kwargs["tool_calls"]
-    elif isinstance(message, SystemMessage):
-        message_dict = {'role': 'system', 'content': message.content}
-    elif isinstance(message, FunctionMessage):
-        message_dict = {
-            'role': 'function',
-            'content': message.content,
-            'name': message.name,
-        }
-    elif isinstance(message, ToolMessage):
-        message_dict = {
-            "role": "tool",
-            "content": message.content,
-            "tool_call_id": message.tool_call_id,
-        }
-    else:
+def _chat_message_to_dict(message: ChatMessage) -> dict:
+    return {'role': message.role, 'content': message.content}
+
+
+def _human_message_to_dict(message: HumanMessage) -> dict:
+    return {'role': 'user', 'content': message.content}
+
+
+def _ai_message_to_dict(message: AIMessage) -> dict:
+    message_dict = {'role': 'assistant', 'content': message.content}
+    if 'function_call' in message.additional_kwargs:
+        message_dict['function_call'] = message.additional_kwargs['function_call']
+    if "tool_calls" in message.additional_kwargs:
+        message_dict["tool_calls"] = message.additional_kwargs["tool_calls"]
+    return message_dict
+
+
+def _system_message_to_dict(message: SystemMessage) -> dict:
+    return {'role': 'system', 'content': message.content}
+
+
+def _function_message_to_dict(message: FunctionMessage) -> dict:
+    return {
+        'role': 'function',
+        'content': message.content,
+        'name': message.name,
+    }
+
+
+def _tool_message_to_dict(message: ToolMessage) -> dict:
+    return {
+        "role": "tool",
+        "content": message.content,
+        "tool_call_id": message.tool_call_id,
+    }
+
+
+# 按消息类型直接查表转换，避免逐个isinstance判断
+_MESSAGE_CONVERTERS: Dict[type, Callable[[Any], dict]] = {
+    ChatMessage: _chat_message_to_dict,
+    HumanMessage: _human_message_to_dict,
+    AIMessage: _ai_message_to_dict,
+    SystemMessage: _system_message_to_dict,
+    FunctionMessage: _function_message_to_dict,
+    ToolMessage: _tool_message_to_dict,
+}
+
+
+# 固定角色的消息类型，ChatMessage的角色取自消息本身
+_MESSAGE_ROLES: Dict[type, str] = {
+    HumanMessage: 'user',
+    AIMessage: 'assistant',
+    SystemMessage: 'system',
+    FunctionMessage: 'function',
+    ToolMessage: 'tool',
+}
+
+
+def _lookup_by_message_type(table: Dict[type, Any], message: BaseMessage) -> Any:
+    value = table.get(type(message))
+    if value is None:
+        # 子类(如各种MessageChunk)沿继承链查找
+        for message_type in type(message).__mro__:
+            if message_type in table:
+                return table[message_type]
         raise ValueError(f'Got unknown type {message}')
+    return value
+
+
+def _get_message_role(message: BaseMessage) -> str:
+    if isinstance(message, ChatMessage):
+        return message.role
+    return _lookup_by_message_type(_MESSAGE_ROLES, message)
+
+
+def _convert_message_to_dict(message: BaseMessage) -> dict:
+    message_dict = _lookup_by_message_type(_MESSAGE_CONVERTERS, message)(message)
     if 'name' in message.additional_kwargs:
         message_dict['name'] = message.additional_kwargs['name']
     return message_dict
@@ -116,6 +169,19 @@ def _convert_dict_to_message(_dict: Mapping[str, Any]) -> BaseMessage:
         return ChatMessage(content=_dict['content'], role=role)
 
 
+@functools.lru_cache(maxsize=16)
+def _resolve_encoding(model: str) -> Tuple[str, tiktoken.Encoding]:
+    """按模型名缓存tiktoken编码，避免每次计数都查找模型注册表"""
+    tiktoken_ = _import_tiktoken()
+    try:
+        encoding = tiktoken_.encoding_for_model(model)
+    except KeyError:
+        logger.warning('Warning: model not found. Using cl100k_base encoding.')
+        model = 'cl100k_base'
+        encoding = tiktoken_.get_encoding(model)
+    return model, encoding
+
+
 url = 'https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation'
 
 
@@ -202,7 +268,12 @@ class ChatQWen(BaseChatModel):
                     'Authorization': f'Bearer {self.dashscope_api_key}',
                     'Content-Type': 'application/json'
                 }
-                self.client = Requests(headers=header, )
+                # 复用同一个连接池，避免每次请求重新建立TLS连接
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self.client = Requests(headers=header, session=session)
             except AttributeError:
                 raise ValueError(
                     'Try upgrading it with `pip install --upgrade requests`.'
@@ -224,7 +295,6 @@ class ChatQWen(BaseChatModel):
 
     def completion_with_retry(self, **kwargs: Any) -> Any:
         retry_decorator = _create_retry_decorator(self)
-        self.client.headers.pop('Accept', '')
 
         @retry_decorator
         def _completion_with_retry(**kwargs: Any) -> Any:
@@ -249,18 +319,13 @@ class ChatQWen(BaseChatModel):
 
 
     def _combine_llm_outputs(self, llm_outputs: List[Optional[dict]]) -> dict:
-        overall_token_usage: dict = {}
+        overall_token_usage = Counter()
         for output in llm_outputs:
             if output is None:
                 # Happens in streaming
                 continue
-            token_usage = output['token_usage']
-            for k, v in token_usage.items():
-                if k in overall_token_usage:
-                    overall_token_usage[k] += v
-                else:
-                    overall_token_usage[k] = v
-        return {'token_usage': overall_token_usage, 'model_name': self.model_name}
+            overall_token_usage.update(output['token_usage'])
+        return {'token_usage': dict(overall_token_usage), 'model_name': self.model_name}
 
     def _generate(
         self,
@@ -366,24 +431,23 @@ class ChatQWen(BaseChatModel):
             role = 'assistant'
             params['stream'] = True
             tool_calls: Optional[list[dict]] = None
+            on_llm_new_token = run_manager.on_llm_new_token if run_manager else None
             async for is_error, stream_resp in self.acompletion_with_retry(messages=message_dicts,
                                                                            **params):
-                output = None
-                msg = json.loads(stream_resp)
                 if is_error:
                     logger.error(stream_resp)
                     raise ValueError(stream_resp)
-                if 'output' in msg:
-                    output = msg['output']
-                choices = output.get('choices')
+                output = orjson.loads(stream_resp).get('output')
+                choices = output.get('choices') if output else None
                 if choices:
                     for choice in choices:
-                        role = choice['message'].get('role', role)
-                        token = choice['message'].get('content', '')
+                        choice_message = choice['message']
+                        role = choice_message.get('role', role)
+                        token = choice_message.get('content', '')
                         inner_completion += token or ''
-                        _tool_calls = choice['message'].get('tool_calls')
-                        if run_manager:
-                            await run_manager.on_llm_new_token(token)
+                        _tool_calls = choice_message.get('tool_calls')
+                        if on_llm_new_token:
+                            await on_llm_new_token(token)
                         if _tool_calls:
                             if tool_calls is None:
                                 tool_calls = _tool_calls
@@ -454,20 +518,8 @@ class ChatQWen(BaseChatModel):
         return 'qwen'
 
     def _get_encoding_model(self) -> Tuple[str, tiktoken.Encoding]:
-        tiktoken_ = _import_tiktoken()
-        if self.tiktoken_model_name is not None:
-            model = self.tiktoken_model_name
-        else:
-            model = self.model_name
-            # model chatglm-std, chatglm-lite
-        # Returns the number of tokens used by a list of messages.
-        try:
-            encoding = tiktoken_.encoding_for_model(model)
-        except KeyError:
-            logger.warning('Warning: model not found. Using cl100k_base encoding.')
-            model = 'cl100k_base'
-            encoding = tiktoken_.get_encoding(model)
-        return model, encoding
+        # model chatglm-std, chatglm-lite
+        return _resolve_encoding(self.tiktoken_model_name or self.model_name)
 
     def get_token_ids(self, text: str) -> List[int]:
         """Get the tokens present in the text with tiktoken package."""
@@ -498,13 +550,20 @@ class ChatQWen(BaseChatModel):
                 'See https://github.com/openai/openai-python/blob/main/chatml.md for '
                 'information on how messages are converted to tokens.')
         num_tokens = 0
-        messages_dict = [_convert_message_to_dict(m) for m in messages]
-        for message in messages_dict:
+        # 直接读取消息的字段，一次遍历收集待编码的文本，不再为每条消息构造请求用的dict
+        texts = []
+        for message in messages:
             num_tokens += tokens_per_message
-            for key, value in message.items():
-                num_tokens += len(encoding.encode(value))
-                if key == 'name':
-                    num_tokens += tokens_per_name
+            texts.append(_get_message_role(message))
+            texts.append(message.content)
+            name = message.additional_kwargs.get(
+                'name', message.name if isinstance(message, FunctionMessage) else None)
+            if name is not None:
+                texts.append(name)
+                num_tokens += tokens_per_name
+            if isinstance(message, ToolMessage):
+                texts.append(message.tool_call_id)
+        num_tokens += sum(len(encoding.encode(text)) for text in texts)
         # every reply is primed with <im_start>assistant
         num_tokens += 3
         return num_tokens
@@ -515,8 +574,8 @@ class ChatQWen(BaseChatModel):
         parameters = {}
         input = {}
         if messages is not None:
-            msgs = copy.deepcopy(messages)
-            input = {'messages': msgs}
+            # messages由_create_message_dicts新建，这里只会改动外层的input，无需深拷贝
+            input = {'messages': messages}
 
         if model.startswith('qwen'):
             enable_search = kwargs.pop('enable_search', False)
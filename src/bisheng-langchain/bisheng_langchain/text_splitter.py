@@ -88,6 +88,9 @@ class ElemCharacterTextSplitter(RecursiveCharacterTextSplitter):
     todo
     """
 
+    # metadata keys holding per-element layout info produced by the elem loaders
+    _layout_keys = frozenset(['indexes', 'pages', 'types', 'bboxes'])
+
     def __init__(
             self,
             separators: Optional[List[str]] = None,
@@ -173,9 +176,14 @@ class ElemCharacterTextSplitter(RecursiveCharacterTextSplitter):
             types = metadatas[i].get('types', [])
             bboxes = metadatas[i].get('bboxes', [])
             searcher = IntervalSearch(indexes)
+            # The per-element layout lists grow with the document, so deep copying them for
+            # every chunk is quadratic. Copy the rest once per chunk and share the layout lists.
+            base_metadata = {k: v for k, v in metadatas[i].items() if k not in self._layout_keys}
+            layout_metadata = {k: v for k, v in metadatas[i].items() if k in self._layout_keys}
             split_texts = self.split_text(text)
             for chunk in split_texts:
-                new_metadata = copy.deepcopy(metadatas[i])
+                new_metadata = copy.deepcopy(base_metadata)
+                new_metadata.update(layout_metadata)
                 if indexes and bboxes:
                     index = text.find(chunk, index + 1)
                     inter0 = [index, index + len(chunk) - 1]
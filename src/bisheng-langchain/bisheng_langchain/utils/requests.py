@@ -17,52 +17,57 @@ class Requests(BaseModel):
 
     headers: Optional[Dict[str, str]] = None
     aiosession: Optional[aiohttp.ClientSession] = None
+    session: Optional[requests.Session] = None
+    """同步请求复用的session，为空时每次请求新建连接"""
     auth: Optional[Any] = None
     request_timeout: Union[float, Tuple[float, float]] = 120
     model_config = ConfigDict(extra="forbid", arbitrary_types_allowed=True)
 
+    def _requester(self) -> Any:
+        return self.session if self.session is not None else requests
+
     def get(self, url: str, **kwargs: Any) -> requests.Response:
         """GET the URL and return the text."""
-        return requests.get(url,
-                            headers=self.headers,
-                            auth=self.auth,
-                            timeout=self.request_timeout,
-                            **kwargs)
+        return self._requester().get(url,
+                                     headers=self.headers,
+                                     auth=self.auth,
+                                     timeout=self.request_timeout,
+                                     **kwargs)
 
     def post(self, url: str, json: Dict[str, Any], **kwargs: Any) -> requests.Response:
         """POST to the URL and return the text."""
-        return requests.post(url,
-                             json=json,
-                             headers=self.headers,
-                             auth=self.auth,
-                             timeout=self.request_timeout,
-                             **kwargs)
+        return self._requester().post(url,
+                                      json=json,
+                                      headers=self.headers,
+                                      auth=self.auth,
+                                      timeout=self.request_timeout,
+                                      **kwargs)
 
     def patch(self, url: str, json: Dict[str, Any], **kwargs: Any) -> requests.Response:
         """PATCH the URL and return the text."""
-        return requests.patch(url,
-                              json=json,
-                              headers=self.headers,
-                              auth=self.auth,
-                              timeout=self.request_timeout,
-                              **kwargs)
+        return self._requester().patch(url,
+                                       json=json,
+                                       headers=self.headers,
+                                       auth=self.auth,
+                                       timeout=self.request_timeout,
+                                       **kwargs)
 
     def put(self, url: str, json: Dict[str, Any], **kwargs: Any) -> requests.Response:
         """PUT the URL and return the text."""
-        return requests.put(url,
-                            json=json,
-                            headers=self.headers,
-                            auth=self.auth,
-                            timeout=self.request_timeout,
-                            **kwargs)
+        return self._requester().put(url,
+                                     json=json,
+                                     headers=self.headers,
+                                     auth=self.auth,
+                                     timeout=self.request_timeout,
+                                     **kwargs)
 
     def delete(self, url: str, **kwargs: Any) -> requests.Response:
         """DELETE the URL and return the text."""
-        return requests.delete(url,
-                               headers=self.headers,
-                               auth=self.auth,
-                               timeout=self.request_timeout,
-                               **kwargs)
+        return self._requester().delete(url,
+                                        headers=self.headers,
+                                        auth=self.auth,
+                                        timeout=self.request_timeout,
+                                        **kwargs)
 
     @asynccontextmanager
     async def _arequest(self, method: str, url: str,
@@ -50,6 +50,9 @@ class Milvus(MilvusLangchain):
             HNSW/AUTOINDEX depending on service.
         search_params (Optional[dict]): Which search params to use. Defaults to
             default of index.
+        index_search_params (Optional[dict]): Default search params overrides keyed
+            by index type, e.g. {"HNSW": {"params": {"ef": 64}}}. The collection's
+            own index type and metric still decide which entry is used.
         drop_old (Optional[bool]): Whether to drop the current collection. Defaults
             to False.
 
@@ -108,6 +111,7 @@ class Milvus(MilvusLangchain):
                  drop_old: Optional[bool] = False,
                  partition_key: Optional[str] = None,
                  metadata_expr: Optional[str] = None,
+                 index_search_params: Optional[dict] = None,
                  *,
                  primary_field: str = 'pk',
                  text_field: str = 'text',
@@ -182,6 +186,12 @@ class Milvus(MilvusLangchain):
                 'params': {}
             },
         }
+        # 按索引类型覆盖默认检索参数，实际使用哪一组仍由collection自身的索引决定
+        for index_type, index_search_param in (index_search_params or {}).items():
+            self.default_search_params[index_type] = {
+                **self.default_search_params.get(index_type, {}),
+                **index_search_param,
+            }
 
         self.embedding_func = embedding_function
         self.collection_name = collection_name